@@ -0,0 +1,126 @@
+# cython: language_level=3
+##
+# Copyright (c) 2021 WALLIX. All rights reserved.
+# Licensed computer software. Property of WALLIX.
+##
+"""Compiled accelerator for conf_migrate.parse_configuration.
+
+Build in place with:
+
+    python3 setup_conf_migrate_c.py build_ext --inplace
+
+conf_migrate picks it up automatically and falls back to the pure-Python
+scanner when the module is not built. The logic mirrors
+conf_migrate.iter_parse_configuration exactly; only the loop bookkeeping
+is compiled down to C.
+"""
+
+import sys
+
+from conf_migrate import (ConfigKind,
+                          ConfigurationFragment,
+                          newline_fragment,
+                          novalue,
+                          _shared_fragment)
+
+_new_fragment = tuple.__new__
+
+_SECTION = ConfigKind.Section
+_KEYVALUE = ConfigKind.KeyValue
+_COMMENT = ConfigKind.Comment
+_UNKNOWN = ConfigKind.Unknown
+
+_BLANKS = ' \t'
+
+
+def parse_configuration(content: str) -> list:
+    cdef Py_ssize_t pos, end, i0, s, e, e2, j, k, eq, send, vstart
+    cdef Py_ssize_t iline, ilast
+
+    fragments = []
+    append = fragments.append
+    intern = sys.intern
+
+    lines = content.split('\n')
+    ilast = len(lines) - 1
+    for iline, line in enumerate(lines):
+        pos = 0
+        end = len(line)
+        while pos != end:
+            i0 = pos
+            while i0 != end and line[i0] in _BLANKS:
+                i0 += 1
+
+            if i0 == end:
+                # only blank characters
+                append(_shared_fragment(line[pos:], _UNKNOWN))
+                break
+
+            c = line[i0]
+
+            # comment
+            if c == '#':
+                append(_shared_fragment(line[pos:], _COMMENT))
+                break
+
+            # section (may be followed by other fragments on the same line)
+            if c == '[':
+                s = i0 + 1
+                while s != end and line[s] in _BLANKS:
+                    s += 1
+                name = ''
+                e = line.find(']', s)
+                if e != -1:
+                    if e != s:
+                        name = line[s:e].rstrip(_BLANKS)
+                    else:
+                        e2 = line.find(']', e + 1)
+                        if e2 != -1:
+                            name = line[s:e2].rstrip(_BLANKS)
+                            e = e2
+                        elif s != i0 + 1:
+                            name = line[s-1]
+                if name:
+                    send = e + 1
+                    while send != end and line[send] in _BLANKS:
+                        send += 1
+                    append(_new_fragment(ConfigurationFragment, (
+                        line[pos:send], _SECTION,
+                        intern(name), novalue,
+                    )))
+                    pos = send
+                    continue
+
+            # variable
+            key = None
+            vstart = 0
+            j = i0
+            while j != end and not line[j].isspace():
+                j += 1
+            if j != i0:
+                k = j
+                while k != end and line[k] in _BLANKS:
+                    k += 1
+                if k != end and line[k] == '=':
+                    key = line[i0:j]
+                    vstart = k + 1
+                else:
+                    eq = line.rfind('=', i0 + 1, j)
+                    if eq != -1:
+                        key = line[i0:eq]
+                        vstart = eq + 1
+
+            if key is not None:
+                append(_new_fragment(ConfigurationFragment, (
+                    line[pos:], _KEYVALUE,
+                    intern(key),
+                    line[vstart:].strip(_BLANKS),
+                )))
+            else:
+                append(_shared_fragment(line[pos:], _UNKNOWN))
+            break
+
+        if iline != ilast:
+            append(newline_fragment)
+
+    return fragments
@@ -0,0 +1,12 @@
+#!/usr/bin/python3
+"""Build the optional compiled tokenizer next to conf_migrate.py:
+
+    python3 setup_conf_migrate_c.py build_ext --inplace
+
+Requires cython. conf_migrate works without it.
+"""
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(name='conf_migrate_c',
+      ext_modules=cythonize('conf_migrate_c.pyx'))
@@ -70,10 +70,11 @@ class TestMigration(unittest.TestCase):
         '''
 
         self.assertEqual(fragments_to_spans_of_sections(parse_configuration(ini)), {
-            'sec1': [(1, 3)],
-            'sec2': [(4, 6), (10, 15)],
-            'sec3': [(7, 9)],
-            'sec4': [(16, 19)],
+            '': [(0, 1)],
+            'sec1': [(1, 4)],
+            'sec2': [(4, 7), (10, 16)],
+            'sec3': [(7, 10)],
+            'sec4': [(16, 21)],
         })
 
     def test_migrate(self):
@@ -121,26 +122,26 @@ class TestMigration(unittest.TestCase):
         self.assertEqual(migration_def_to_actions(fragments, migrate_def), (
             # renamed_sections
             [('moved_section', 'new_moved_section')],
-            # renamed_keys
+            # renamed_keys (first item is the fragment index)
             [
-                ('sec1', 'moved_key', 'moved_key_to_a', 'vva'),
-                ('sec1', 'updated_value', 'updated_value', 'new_b')
+                (13, 'sec1', 'moved_key', 'moved_key_to_a', 'vva'),
+                (15, 'sec1', 'updated_value', 'updated_value', 'new_b')
             ],
-            # moved_keys
+            # moved_keys (first item is the fragment index)
             [
-                ('moved_section', 'moved_key_to_removed_section',
+                (2, 'moved_section', 'moved_key_to_removed_section',
                  'removed_section', 'moved_key_to_removed_section', 'va'),
-                ('moved_section', 'moved_key_to_new_section',
+                (4, 'moved_section', 'moved_key_to_new_section',
                  'sec4', 'moved_key_to_new_section', 'vb'),
-                ('moved_section', 'moved_key_to_new_section_and_renamed_key_to_cc',
+                (6, 'moved_section', 'moved_key_to_new_section_and_renamed_key_to_cc',
                  'sec1', 'cc', 'vc'),
-                ('moved_section', 'moved_key_to_new_section5',
+                (8, 'moved_section', 'moved_key_to_new_section5',
                  'sec5', 'moved_key_to_new_section5', 'vd'),
             ],
             # removed_sections
             ['removed_section'],
-            # removed_keys
-            [('sec1', 'removed_key')]
+            # removed_keys (first item is the fragment index)
+            [(17, 'sec1', 'removed_key')]
         ))
 
         self.assertEqual(migrate(fragments, {}), (False, fragments))